@@ -11,8 +11,29 @@ import sys
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'peer'))
 
 
+def create_large_file(filepath, size_bytes):
+    """Fill a file with random bytes at device speed.
+
+    The file is fallocated to its final size up front so the
+    filesystem can place it contiguously, then filled from /dev/urandom
+    through one reused 4 MiB buffer — no per-chunk os.urandom
+    allocations and a handful of syscalls per write instead of one per
+    small chunk.
+    """
+    buf = bytearray(4 * 1024 * 1024)
+    with open(filepath, "wb", buffering=0) as f:
+        os.posix_fallocate(f.fileno(), 0, size_bytes)
+        with open("/dev/urandom", "rb", buffering=0) as rand:
+            remaining = size_bytes
+            while remaining:
+                view = memoryview(buf)[:min(len(buf), remaining)]
+                rand.readinto(view)
+                f.write(view)
+                remaining -= len(view)
+
+
 async def create_test_file():
-    """Create a test file to share."""
+    """Create test files to share."""
     os.makedirs("shared", exist_ok=True)
     
     # Create a test file
@@ -21,6 +42,10 @@ async def create_test_file():
         f.write(test_content)
     
     print(f"✓ Created test file: shared/test.txt ({len(test_content)} bytes)")
+    
+    # A multi-chunk file so the demo exercises the concurrent transfer path
+    create_large_file("shared/testfile_10mb.bin", 10 * 1024 * 1024)
+    print("✓ Created test file: shared/testfile_10mb.bin (10 MiB)")
 
 
 def print_header(title):
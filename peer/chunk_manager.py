@@ -1,26 +1,68 @@
 import os
 import hashlib
+import mmap
+import functools
+from concurrent.futures import ThreadPoolExecutor
 
 CHUNK_SIZE = 1024 * 1024  # 1 MB
 
+# hashlib releases the GIL for buffers larger than ~2 KiB, so chunk digests
+# can be computed in parallel across cores with plain threads
+_hash_pool = ThreadPoolExecutor(max_workers=os.cpu_count())
+
+def _chunk_digest(view):
+    digest = hashlib.sha256(view).digest()
+    view.release()
+    return digest
+
 def get_file_metadata(file_path):
-    file_size = os.path.getsize(file_path)
+    stat = os.stat(file_path)
+    # Hashing is the dominant cost for large files, so cache on identity;
+    # treat the result as read-only
+    return _metadata(file_path, stat.st_mtime_ns, stat.st_size)
+
+@functools.lru_cache(maxsize=128)
+def _metadata(file_path, mtime_ns, file_size):
     total_chunks = (file_size + CHUNK_SIZE - 1) // CHUNK_SIZE  # ceil division
-    file_hash = hashlib.sha256()
-    
-    with open(file_path, "rb") as f:
-        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
-            file_hash.update(chunk)
-            
+
+    # Hash each chunk independently (tree hash): the per-chunk digests are
+    # parallelizable and let the client verify chunks as they arrive; the
+    # file id is the hash of the concatenated chunk digests
+    digests = []
+    if file_size > 0:
+        with open(file_path, "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                view = memoryview(mm)
+                slices = [view[i * CHUNK_SIZE:(i + 1) * CHUNK_SIZE] for i in range(total_chunks)]
+                digests = list(_hash_pool.map(_chunk_digest, slices))
+                view.release()
+
+    file_hash = hashlib.sha256(b"".join(digests)).hexdigest()
+
     return {
         "filename": os.path.basename(file_path),
         "size": file_size,
         "chunksize": CHUNK_SIZE,
         "chunks": total_chunks,
-        "hash": file_hash.hexdigest()
+        "hash": file_hash,
+        "chunk_hashes": [d.hex() for d in digests]
     }
-    
+
+@functools.lru_cache(maxsize=64)
+def _mapped_file(file_path, mtime_ns):
+    # Keep the file mapped across chunk requests: one open() instead of one
+    # per chunk, and slicing the mmap skips the extra read() copy. The mtime
+    # in the key drops stale maps when a shared file is replaced.
+    fd = os.open(file_path, os.O_RDONLY)
+    try:
+        if hasattr(os, "posix_fadvise"):
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        return mmap.mmap(fd, 0, access=mmap.ACCESS_READ)
+    finally:
+        os.close(fd)  # the mmap holds its own reference
+
 def read_chunk(file_path, chunk_index):
-    with open(file_path, "rb") as f:
-        f.seek(chunk_index * CHUNK_SIZE)
-        return f.read(CHUNK_SIZE)
\ No newline at end of file
+    # Returns a zero-copy view into the mapped file; the encrypt path reads
+    # straight out of the page cache with no intermediate bytes object
+    mm = _mapped_file(file_path, os.stat(file_path).st_mtime_ns)
+    return memoryview(mm)[chunk_index * CHUNK_SIZE:(chunk_index + 1) * CHUNK_SIZE]
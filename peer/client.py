@@ -1,247 +1,380 @@
 import asyncio
 import os
+import struct
+import time
 import hashlib
-from .identity import get_peer_id, load_keys
-from .crypto import decrypt_session_key, aes_encrypt, aes_decrypt
-from .protocol import HELLO, SESSION
-from cryptography.hazmat.primitives import serialization
+from .identity import get_identity
+from .crypto import derive_session_key, Session, CLIENT_NONCE_TAG
+from .protocol import (HELLO, SESSION, SOCKET_BUF_SIZE, tune_socket,
+                       OP_META, OP_GET, OP_CHUNK, OP_ERROR)
+from cryptography.hazmat.primitives.asymmetric import x25519
 import httpx
 
-# Maximum concurrent chunk downloads
+# Initial concurrent chunk downloads; the pool grows toward the link's
+# bandwidth-delay product once early throughput is measured
 MAX_CONCURRENT_CHUNKS = 4
+# Upper bound on auto-tuned workers, past which parallelism tends to cause
+# loss and throughput collapse rather than gains
+MAX_TUNED_WORKERS = 64
 # Timeout for connections (increased for large files)
 CONNECT_TIMEOUT = 10
 READ_TIMEOUT = 30
 
 
-async def get_file_metadata(ip, port, filename):
-    """Get file metadata from a peer."""
-    private_key, public_key = load_keys()
-    peer_id = get_peer_id(public_key)
-    
-    try:
-        print(f"[METADATA] Connecting to {ip}:{port}...")
-        reader, writer = await asyncio.wait_for(
-            asyncio.open_connection(ip, port),
-            timeout=CONNECT_TIMEOUT
-        )
-        
-        public_key_pem = public_key.public_bytes(
-            encoding=serialization.Encoding.PEM,
-            format=serialization.PublicFormat.SubjectPublicKeyInfo
-        )
-        
-        hello_msg = HELLO + b"|" + peer_id.encode() + b"|" + public_key_pem
-        writer.write(hello_msg)
-        await writer.drain()
-        
-        data = await reader.read(4096)
-        if not data.startswith(SESSION):
-            return None, None
-        
-        _, encrypted_key = data.split(b"|", 1)
-        aes_key = decrypt_session_key(private_key, encrypted_key)
-        
-        # Request metadata
-        meta_request = f"META|{filename}"
-        encrypted_request = aes_encrypt(aes_key, meta_request.encode())
-        writer.write(len(encrypted_request).to_bytes(4, 'big') + encrypted_request)
-        await writer.drain()
-        
-        # Read encrypted metadata (with length prefix)
-        length_bytes = await reader.readexactly(4)
-        msg_length = int.from_bytes(length_bytes, 'big')
-        encrypted_meta = await reader.readexactly(msg_length)
-        meta_response = aes_decrypt(aes_key, encrypted_meta).decode()
-        
+async def open_session(ip, port, fast_lan=False):
+    """Open a connection to a peer and perform the handshake once.
+
+    Returns (reader, writer, session). The session state is reused for every
+    request sent over this connection, so the RSA handshake cost is paid a
+    single time per peer instead of once per chunk. With fast_lan the
+    session uses ChaCha20-Poly1305 instead of AES-GCM, which is faster on
+    CPUs without AES-NI.
+    """
+    private_key, _, public_key_raw, peer_id = get_identity()
+
+    reader, writer = await asyncio.wait_for(
+        asyncio.open_connection(ip, port),
+        timeout=CONNECT_TIMEOUT
+    )
+    tune_socket(writer.get_extra_info("socket"))
+    writer.transport.set_write_buffer_limits(high=SOCKET_BUF_SIZE)
+
+    # Fixed-length HELLO record: tag + flags (1 byte) + peer_id (32 bytes)
+    # + raw X25519 key (32 bytes); flag bit 0 selects the ChaCha20 cipher
+    flags = b"\x01" if fast_lan else b"\x00"
+    hello_msg = HELLO + flags + bytes.fromhex(peer_id) + public_key_raw
+    t0 = time.monotonic()
+    writer.write(hello_msg)
+    await writer.drain()
+
+    data = await reader.readexactly(len(SESSION) + 32)
+    rtt = time.monotonic() - t0
+    if not data.startswith(SESSION):
         writer.close()
         await writer.wait_closed()
-        
-        if meta_response.startswith("ERROR"):
-            return None, None
-            
-        parts = meta_response.split("|")
-        if len(parts) < 6:
-            return None, None
-        
-        # Return metadata and AES key for this file
-        meta = {
-            "filename": parts[1],
-            "file_size": int(parts[2]),
-            "chunk_size": int(parts[3]),
-            "total_chunks": int(parts[4]),
-            "hash": parts[5]
-        }
-        
-        return meta, None  # We'll establish new connections for chunks
-        
-    except Exception as e:
-        print(f"Error getting metadata: {e}")
-        return None, None
+        raise ConnectionError("Handshake failed: no SESSION message")
 
+    server_public_key = x25519.X25519PublicKey.from_public_bytes(data[-32:])
+    if fast_lan:
+        key = derive_session_key(private_key, server_public_key, length=32)
+        session = Session(key, CLIENT_NONCE_TAG, cipher="chacha20")
+    else:
+        key = derive_session_key(private_key, server_public_key)
+        session = Session(key, CLIENT_NONCE_TAG)
 
-async def download_single_chunk(ip, port, filename, chunk_index):
-    """Download a single chunk by establishing a new connection."""
-    private_key, public_key = load_keys()
-    peer_id = get_peer_id(public_key)
-    
-    try:
-        reader, writer = await asyncio.wait_for(
-            asyncio.open_connection(ip, port),
-            timeout=CONNECT_TIMEOUT
-        )
-        
-        public_key_pem = public_key.public_bytes(
-            encoding=serialization.Encoding.PEM,
-            format=serialization.PublicFormat.SubjectPublicKeyInfo
-        )
-        
-        hello_msg = HELLO + b"|" + peer_id.encode() + b"|" + public_key_pem
-        writer.write(hello_msg)
-        await writer.drain()
-        
-        data = await reader.read(4096)
-        if not data.startswith(SESSION):
-            return None
-        
-        _, encrypted_key = data.split(b"|", 1)
-        aes_key = decrypt_session_key(private_key, encrypted_key)
-        
-        # Request chunk with length prefix
-        get_request = f"GET|{filename}|{chunk_index}"
-        encrypted_request = aes_encrypt(aes_key, get_request.encode())
+    return reader, writer, session, rtt
+
+
+async def send_request(writer, session, message, write_lock):
+    """Encrypt a request and write it with a length prefix.
+
+    The write lock serializes workers sharing the socket so concurrent
+    requests never interleave frames.
+    """
+    encrypted_request = session.encrypt(message)
+    async with write_lock:
         writer.write(len(encrypted_request).to_bytes(4, 'big') + encrypted_request)
         await writer.drain()
-        
-        # Read encrypted chunk with length prefix
-        try:
-            length_bytes = await reader.readexactly(4)
-            msg_length = int.from_bytes(length_bytes, 'big')
-            encrypted_chunk = await reader.readexactly(msg_length)
-        except asyncio.IncompleteReadError as e:
-            print(f"Error reading chunk {chunk_index}: incomplete read")
-            writer.close()
-            await writer.wait_closed()
-            return None
-        
-        chunk_data = aes_decrypt(aes_key, encrypted_chunk)
-        
+
+
+async def read_response(reader, session):
+    """Read one length-prefixed encrypted message and decrypt it."""
+    length_bytes = await reader.readexactly(4)
+    msg_length = int.from_bytes(length_bytes, 'big')
+    encrypted_response = await reader.readexactly(msg_length)
+    return session.decrypt(encrypted_response)
+
+
+async def request_metadata(reader, writer, session, filename, write_lock):
+    """Request file metadata over an established session.
+
+    Parsed at the bytes level because single-chunk files arrive inline as
+    a trailing binary field, skipping the per-chunk GET round-trip.
+    """
+    await send_request(writer, session, bytes([OP_META]) + filename.encode(), write_lock)
+    meta_response = await read_response(reader, session)
+
+    if not meta_response or meta_response[0] != OP_META:
+        return None
+
+    parts = meta_response[1:].split(b"|", 6)
+    if len(parts) < 5:
+        return None
+
+    meta = {
+        "filename": parts[0].decode(),
+        "file_size": int(parts[1]),
+        "chunk_size": int(parts[2]),
+        "total_chunks": int(parts[3]),
+        "hash": parts[4].decode()
+    }
+    # Per-chunk digests let each chunk be verified as it arrives
+    if len(parts) >= 6 and parts[5]:
+        meta["chunk_hashes"] = parts[5].decode().split(",")
+    if len(parts) >= 7:
+        meta["inline_data"] = parts[6]
+    return meta
+
+
+async def get_file_metadata(ip, port, filename):
+    """Get file metadata from a peer over a short-lived session."""
+    try:
+        print(f"[METADATA] Connecting to {ip}:{port}...")
+        reader, writer, session, _ = await open_session(ip, port)
+        meta = await request_metadata(reader, writer, session, filename, asyncio.Lock())
+
         writer.close()
         await writer.wait_closed()
-        
-        # Parse CHUNK|index|data format
-        chunk_parts = chunk_data.split(b"|", 2)
-        if len(chunk_parts) >= 3 and chunk_parts[0] == b"CHUNK":
-            return chunk_parts[2]
-        
-        return None
-        
+
+        return meta, None
     except Exception as e:
-        print(f"Error downloading chunk {chunk_index}: {e}")
-        return None
+        print(f"Error getting metadata: {e}")
+        return None, None
+
 
+async def connect_to_peer(ip, port, filename, output_dir="downloads", fast_lan=False):
+    """Connect to a peer and download a file with pipelined chunk requests.
 
-async def connect_to_peer(ip, port, filename, output_dir="downloads"):
-    """Connect to a peer and download a file with concurrent chunk downloads."""
+    A single connection (one handshake) is shared by MAX_CONCURRENT_CHUNKS
+    workers: each worker sends a GET request tagged with its chunk index and
+    awaits its response future, while one reader task routes responses back
+    by the index echoed in each CHUNK message. This keeps several requests
+    queued at the server at all times, so the transfer is bandwidth-bound
+    rather than handshake/RTT-bound.
+    """
     try:
         print(f"[DOWNLOAD] Connecting to peer at {ip}:{port}")
         print(f"[DOWNLOAD] Downloading file: {filename}")
-        
-        # Get metadata
-        meta, _ = await get_file_metadata(ip, port, filename)
+
+        reader, writer, session, rtt = await open_session(ip, port, fast_lan)
+        write_lock = asyncio.Lock()
+
+        meta = await request_metadata(reader, writer, session, filename, write_lock)
         if not meta:
             print(f"[ERROR] Failed to get metadata for {filename}")
             print(f"[ERROR] Peer at {ip}:{port} may be offline or file doesn't exist")
+            writer.close()
+            await writer.wait_closed()
             return False
-        
+
         fname = meta["filename"]
         file_size = meta["file_size"]
         total_chunks = meta["total_chunks"]
         file_hash = meta["hash"]
-        
+        chunk_hashes = meta.get("chunk_hashes")
+
         print(f"File metadata: {fname} ({file_size} bytes, {total_chunks} chunks)")
-        
-        # Download chunks concurrently
+
+        if "inline_data" in meta:
+            # Single-chunk file came back with the metadata: one less round-trip
+            data = meta["inline_data"]
+            writer.close()
+            await writer.wait_closed()
+
+            digest = hashlib.sha256(data).digest()
+            if chunk_hashes and digest.hex() != chunk_hashes[0]:
+                print("✗ Inline payload failed hash verification")
+                return False
+
+            os.makedirs(output_dir, exist_ok=True)
+            output_path = os.path.join(output_dir, fname)
+            with open(output_path, "wb") as f:
+                f.write(data)
+
+            calculated_hash = hashlib.sha256(digest).hexdigest()
+            if calculated_hash == file_hash:
+                print(f"✓ File downloaded successfully and verified: {output_path}")
+                return True
+            print(f"✗ Hash mismatch! Expected {file_hash}, got {calculated_hash}")
+            return False
+
         os.makedirs(output_dir, exist_ok=True)
         output_path = os.path.join(output_dir, fname)
-        
-        chunks = {}
-        semaphore = asyncio.Semaphore(MAX_CONCURRENT_CHUNKS)
-        
-        async def download_chunk(index):
-            """Download a single chunk from the peer."""
-            async with semaphore:
-                chunk_data = await download_single_chunk(ip, port, filename, index)
-                if chunk_data:
-                    chunks[index] = chunk_data
-                    print(f"Downloaded chunk {index}/{total_chunks}")
-                    return True
-                return False
-        
-        # Create tasks for all chunks
-        tasks = [download_chunk(i) for i in range(total_chunks)]
-        results = await asyncio.gather(*tasks)
-        
-        if not all(results):
-            print("Some chunks failed to download")
+
+        # Preallocate the output file so verified chunks can be pwritten at
+        # their final offset as they arrive, out of order, keeping peak
+        # memory at ~MAX_CONCURRENT_CHUNKS chunks instead of the whole file
+        out_fd = os.open(output_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        os.ftruncate(out_fd, file_size)
+
+        chunk_size = meta["chunk_size"]
+        digests = {}  # chunk index -> verified SHA-256 digest
+        attempts = {}  # retries per chunk index after digest mismatch
+        pending = {}  # chunk index -> future awaiting its response
+        loop = asyncio.get_running_loop()
+
+        # Progress reporting is throttled: a print per 1 MiB chunk means
+        # thousands of synchronous TTY writes on a large file
+        downloaded = 0
+        last_report = 0.0
+
+        queue = asyncio.Queue()
+        for i in range(total_chunks):
+            queue.put_nowait(i)
+
+        async def route_responses():
+            """Read responses off the shared socket and resolve futures by index."""
+            try:
+                while True:
+                    chunk_data = await read_response(reader, session)
+                    if not chunk_data or chunk_data[0] != OP_CHUNK:
+                        # ERROR or malformed response aborts the transfer
+                        raise ConnectionError(f"Bad response: {chunk_data[:64]!r}")
+                    index = struct.unpack_from("!I", chunk_data, 1)[0]
+                    future = pending.pop(index, None)
+                    if future and not future.done():
+                        # A memoryview hands the payload over without
+                        # copying the chunk out of the decrypted buffer
+                        future.set_result(memoryview(chunk_data)[5:])
+            except Exception as e:
+                # A dropped connection or failed decryption surfaces here;
+                # fail every in-flight request so no worker is left
+                # awaiting a future that can never resolve
+                for future in pending.values():
+                    if not future.done():
+                        future.set_exception(e)
+                pending.clear()
+
+        async def download_worker():
+            """Pull chunk indices off the queue and pipeline GET requests."""
+            while True:
+                try:
+                    index = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                future = loop.create_future()
+                pending[index] = future
+                await send_request(writer, session,
+                                   struct.pack("!BI", OP_GET, index) + filename.encode(),
+                                   write_lock)
+                # The timeout covers the race where the router dies after
+                # this worker registered its future
+                try:
+                    chunk = await asyncio.wait_for(future, READ_TIMEOUT)
+                except asyncio.TimeoutError:
+                    pending.pop(index, None)
+                    raise ConnectionError(f"Timed out waiting for chunk {index}")
+                digest = hashlib.sha256(chunk).digest()
+                if chunk_hashes and digest.hex() != chunk_hashes[index]:
+                    # A corrupt chunk is cheap to re-request on its own;
+                    # only repeated failures abort the transfer
+                    attempts[index] = attempts.get(index, 0) + 1
+                    if attempts[index] >= 3:
+                        raise ConnectionError(f"Chunk {index} failed hash verification")
+                    print(f"Chunk {index} failed verification, re-requesting")
+                    queue.put_nowait(index)
+                    continue
+                os.pwrite(out_fd, chunk, index * chunk_size)
+                digests[index] = digest
+
+                nonlocal downloaded, last_report
+                downloaded += len(chunk)
+                now = time.monotonic()
+                if now - last_report >= 0.1 or len(digests) == total_chunks:
+                    last_report = now
+                    print(f"Downloaded {len(digests)}/{total_chunks} chunks ({downloaded}/{file_size} bytes)")
+
+        router = asyncio.create_task(route_responses())
+
+        async def scale_workers():
+            """Grow the pool toward BDP/chunk_size after a warmup.
+
+            The fixed default underuses high-latency links and over-
+            parallelizes fast LANs; observed early throughput times the
+            handshake RTT estimates the bandwidth-delay product.
+            """
+            warmup = min(8, total_chunks)
+            start = time.monotonic()
+            while len(digests) < warmup:
+                if queue.empty():
+                    return
+                await asyncio.sleep(0.05)
+            elapsed = max(time.monotonic() - start, 1e-6)
+            observed_bw = downloaded / elapsed
+            target = max(MAX_CONCURRENT_CHUNKS,
+                         min(MAX_TUNED_WORKERS, int(observed_bw * rtt / chunk_size)))
+            extra = target - MAX_CONCURRENT_CHUNKS
+            if extra > 0:
+                print(f"Scaling to {target} parallel chunk requests (rtt {rtt * 1000:.1f} ms)")
+                for _ in range(extra):
+                    tg.create_task(download_worker())
+
+        failed = None
+        try:
+            async with asyncio.TaskGroup() as tg:
+                for _ in range(MAX_CONCURRENT_CHUNKS):
+                    tg.create_task(download_worker())
+                tg.create_task(scale_workers())
+        except* Exception as eg:
+            failed = eg.exceptions[0]
+
+        if failed is not None:
+            print(f"Chunk download failed: {failed}")
+            router.cancel()
+            os.close(out_fd)
+            writer.close()
+            await writer.wait_closed()
             return False
-        
-        # Reassemble file
-        print("Reassembling file...")
-        file_hash_obj = hashlib.sha256()
-        
-        with open(output_path, "wb") as f:
-            for i in range(total_chunks):
-                if i not in chunks:
-                    print(f"Missing chunk {i}")
-                    return False
-                f.write(chunks[i])
-                file_hash_obj.update(chunks[i])
-        
-        # Verify integrity
-        calculated_hash = file_hash_obj.hexdigest()
+
+        router.cancel()
+        try:
+            await router
+        except asyncio.CancelledError:
+            pass
+        os.close(out_fd)
+        writer.close()
+        await writer.wait_closed()
+
+        if len(digests) != total_chunks:
+            print(f"Missing {total_chunks - len(digests)} chunk(s)")
+            return False
+
+        # Verify integrity: the file id is the hash of the chunk digests
+        calculated_hash = hashlib.sha256(
+            b"".join(digests[i] for i in range(total_chunks))
+        ).hexdigest()
         if calculated_hash == file_hash:
             print(f"✓ File downloaded successfully and verified: {output_path}")
             return True
         else:
             print(f"✗ Hash mismatch! Expected {file_hash}, got {calculated_hash}")
             return False
-            
+
     except Exception as e:
         print(f"Error: {e}")
         return False
 
 
-async def download_from_discovery(discovery_url, filename, output_dir="downloads"):
+async def download_from_discovery(discovery_url, filename, output_dir="downloads", fast_lan=False):
     """Find peers with a file and download from the first available one."""
     try:
         async with httpx.AsyncClient(timeout=10.0) as client:
             # Query discovery service for peers with this file
             response = await client.get(f"{discovery_url}/peers", params={"file": filename})
             peers_data = response.json()
-            
+
             if not peers_data.get("peers"):
                 print(f"No peers found with file: {filename}")
                 return False
-            
+
             peers = peers_data["peers"]
             print(f"Found {len(peers)} peer(s) with {filename}")
-            
+
             # Try each peer until successful
             for peer in peers:
                 peer_id = peer["peer_id"]
                 ip = peer["ip"]
                 port = peer["port"]
-                
+
                 print(f"Trying to download from peer {peer_id[:8]}... at {ip}:{port}")
-                success = await connect_to_peer(ip, port, filename, output_dir)
-                
+                success = await connect_to_peer(ip, port, filename, output_dir, fast_lan)
+
                 if success:
                     return True
-            
+
             print("Failed to download from all available peers")
             return False
-            
+
     except Exception as e:
         print(f"Error querying discovery service: {e}")
-        return False
\ No newline at end of file
+        return False
@@ -1,5 +1,5 @@
-import os, hashlib
-from cryptography.hazmat.primitives.asymmetric import rsa
+import os, hashlib, functools
+from cryptography.hazmat.primitives.asymmetric import x25519
 from cryptography.hazmat.primitives import serialization
 from cryptography.hazmat.backends import default_backend
 
@@ -10,11 +10,7 @@ PUBLIC_KEY_PATH = os.path.join(KEY_DIR, "public_key.pem")
 def generate_keys():
     os.makedirs(KEY_DIR, exist_ok=True)
     
-    private_key = rsa.generate_private_key(
-        public_exponent=65537,
-        key_size=2048,
-        backend=default_backend()
-    )
+    private_key = x25519.X25519PrivateKey.generate()
     public_key = private_key.public_key()
 
     with open(PRIVATE_KEY_PATH, "wb") as f:
@@ -30,10 +26,7 @@ def generate_keys():
             format=serialization.PublicFormat.SubjectPublicKeyInfo
         ))
         
-def load_keys():
-    if not os.path.exists(PRIVATE_KEY_PATH) or not os.path.exists(PUBLIC_KEY_PATH):
-        generate_keys()
-        
+def _read_keys():
     with open(PRIVATE_KEY_PATH, "rb") as f:
         private_key = serialization.load_pem_private_key(
             f.read(),
@@ -49,6 +42,23 @@ def load_keys():
         
     return private_key, public_key
 
+@functools.lru_cache(maxsize=1)
+def load_keys():
+    if not os.path.exists(PRIVATE_KEY_PATH) or not os.path.exists(PUBLIC_KEY_PATH):
+        generate_keys()
+        
+    private_key, public_key = _read_keys()
+    
+    # Keys from an older install (RSA) load fine from PEM but cannot
+    # produce the raw 32-byte wire form the handshake sends; regenerate
+    # instead of failing every transfer
+    if not isinstance(private_key, x25519.X25519PrivateKey):
+        print("Stored keys are not X25519; generating a new key pair")
+        generate_keys()
+        private_key, public_key = _read_keys()
+        
+    return private_key, public_key
+
 def get_peer_id(public_key):
     pem = public_key.public_bytes(
         encoding=serialization.Encoding.PEM,
@@ -56,4 +66,14 @@ def get_peer_id(public_key):
     )
     
     # return the SHA-256 hash of the PEM-encoded public key as the peer ID. 32 bytes (64 hex characters)
-    return hashlib.sha256(pem).hexdigest()
\ No newline at end of file
+    return hashlib.sha256(pem).hexdigest()
+@functools.lru_cache(maxsize=1)
+def get_identity():
+    """Load the key pair once and precompute the wire forms sent on every
+    connection (raw public key bytes and peer ID)."""
+    private_key, public_key = load_keys()
+    public_key_raw = public_key.public_bytes(
+        encoding=serialization.Encoding.Raw,
+        format=serialization.PublicFormat.Raw
+    )
+    return private_key, public_key, public_key_raw, get_peer_id(public_key)
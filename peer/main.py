@@ -1,7 +1,11 @@
 from fastapi import FastAPI, Request, HTTPException
+from fastapi.responses import Response
 from .identity import load_keys, get_peer_id
 from pydantic import BaseModel
-from typing import List, Dict
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import heapq
+import orjson
 import time
 
 app = FastAPI()
@@ -9,63 +13,151 @@ app = FastAPI()
 PEERS: Dict[str, Dict] = {}
 TIL = 60  # Time-to-live for peer entries in seconds
 
+# UDP port for heartbeat datagrams (discovery HTTP port + 1 by convention)
+HEARTBEAT_PORT = 8001
+
+# Min-heap of (expiry, peer_id) so expired peers are pruned with a few heap
+# pops instead of scanning (and mutating) PEERS while iterating it. Stale
+# entries from refreshed peers are lazily discarded against last_seen.
+EXPIRY_HEAP: List[Tuple[float, str]] = []
+
+# Inverted index filename -> peer_ids so file queries touch only the peers
+# that actually hold the file instead of scanning every registration
+FILE_INDEX: Dict[str, set] = {}
+
+# Serialized /peers responses keyed by the file filter. Peer state changes
+# on the register/heartbeat timescale, so repeat queries within the TTL
+# reuse the same orjson bytes instead of rebuilding and re-serializing.
+PEERS_CACHE_TTL = 1.0
+_PEERS_CACHE: Dict[Optional[str], Tuple[float, bytes]] = {}
+
 class RegisterRequest(BaseModel):
     peer_id: str
     public_key: str
     port: int
     files: List[str]
     ip: str = None  # Peer can optionally provide its own IP
-    
+
+
+def _unindex_peer(peer_id, files):
+    for f in files:
+        peer_ids = FILE_INDEX.get(f)
+        if peer_ids:
+            peer_ids.discard(peer_id)
+            if not peer_ids:
+                del FILE_INDEX[f]
+
+
+def prune_expired_peers(now):
+    """Drop peers whose TTL has lapsed, in O(expired) rather than O(all)."""
+    while EXPIRY_HEAP and EXPIRY_HEAP[0][0] < now:
+        _, peer_id = heapq.heappop(EXPIRY_HEAP)
+        info = PEERS.get(peer_id)
+        # Lazy delete: the peer may have re-registered or heartbeated since
+        # this heap entry was pushed
+        if info and info["last_seen"] + TIL < now:
+            del PEERS[peer_id]
+            _unindex_peer(peer_id, info["files"])
+
 
 @app.post("/register")
 async def register_peer(request: Request, data: RegisterRequest):
     # Use provided IP, fallback to client IP detection
     client_ip = data.ip if data.ip else request.client.host
-    
+
     # Map localhost to actual IP for multi-device scenarios
     if client_ip in ["127.0.0.1", "localhost"]:
         client_ip = request.client.host  # Still use request IP as fallback
-    
+
+    now = time.time()
+    previous = PEERS.get(data.peer_id)
+    if previous:
+        _unindex_peer(data.peer_id, previous["files"])
     PEERS[data.peer_id] = {
         "ip": client_ip,
         "port": data.port,
         "public_key": data.public_key,
         "files": data.files,
-        "last_seen": time.time()
+        "last_seen": now
     }
-    
+    heapq.heappush(EXPIRY_HEAP, (now + TIL, data.peer_id))
+    for f in data.files:
+        FILE_INDEX.setdefault(f, set()).add(data.peer_id)
+
+    # Registration changes query results, so drop affected cache entries
+    _PEERS_CACHE.pop(None, None)
+    for f in (previous["files"] if previous else []) + data.files:
+        _PEERS_CACHE.pop(f, None)
+
     print(f"[DISCOVERY] Registered peer {data.peer_id[:8]}... at {client_ip}:{data.port}")
-    
+
     return {"message": "registered", "ip": client_ip}
 
 
 @app.get("/heartbeat")
 async def heartbeat(peer_id: str):
     if peer_id in PEERS:
-        PEERS[peer_id]["last_seen"] = time.time()
+        now = time.time()
+        PEERS[peer_id]["last_seen"] = now
+        heapq.heappush(EXPIRY_HEAP, (now + TIL, peer_id))
         return {"message": "heartbeat received"}
-    
+
     return {"error": "peer not found"}
 
 
 @app.get("/peers")
 async def get_peers(file: str = None):
     now = time.time()
+    cached = _PEERS_CACHE.get(file)
+    if cached and now - cached[0] < PEERS_CACHE_TTL:
+        return Response(cached[1], media_type="application/json")
+
+    prune_expired_peers(now)
+
+    if file is None:
+        candidates = PEERS.keys()
+    else:
+        candidates = FILE_INDEX.get(file, ())
+
     active_peers = []
-    
-    for peer_id, info in PEERS.items():
-        if now - info["last_seen"] > TIL:
-            del PEERS[peer_id]  # Remove stale peer
+    for peer_id in candidates:
+        info = PEERS.get(peer_id)
+        if info is None:
             continue
-        
-        if file is None or file in info["files"]:
-            active_peers.append({
-                "peer_id": peer_id,
-                "ip": info["ip"],
-                "port": info["port"],
-                "files": info["files"]
-            })
-    
-    return {"peers": active_peers}
+        active_peers.append({
+            "peer_id": peer_id,
+            "ip": info["ip"],
+            "port": info["port"],
+            "files": info["files"]
+        })
+
+    body = orjson.dumps({"peers": active_peers})
+    _PEERS_CACHE[file] = (now, body)
+    return Response(body, media_type="application/json")
+
+
+class HeartbeatProtocol(asyncio.DatagramProtocol):
+    """Bumps last_seen from bare peer_id datagrams.
+
+    A heartbeat is a single UDP packet: no TCP handshake, no HTTP parse,
+    so the per-beat cost at the discovery service is one recvfrom and a
+    dict update regardless of peer count.
+    """
+
+    def datagram_received(self, data, addr):
+        peer_id = data.decode(errors="ignore").strip()
+        info = PEERS.get(peer_id)
+        if info:
+            now = time.time()
+            info["last_seen"] = now
+            heapq.heappush(EXPIRY_HEAP, (now + TIL, peer_id))
 
 
+@app.on_event("startup")
+async def start_heartbeat_listener():
+    loop = asyncio.get_running_loop()
+    await loop.create_datagram_endpoint(
+        HeartbeatProtocol,
+        local_addr=("0.0.0.0", HEARTBEAT_PORT)
+    )
+    print(f"[DISCOVERY] UDP heartbeat listener on port {HEARTBEAT_PORT}")
@@ -12,11 +12,13 @@ import argparse
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from peer.identity import load_keys, get_peer_id
-from peer.server import start_server
+from peer.server import start_server, start_server_processes
 from peer.client import download_from_discovery
 import httpx
+import orjson
 import uvicorn
-from peer.main import app as discovery_app
+import uvloop
+from peer.main import app as discovery_app, HEARTBEAT_PORT
 from threading import Thread
 import time
 
@@ -35,7 +37,11 @@ async def register_peer(discovery_url, peer_id, public_key_pem, port, shared_dir
                 "port": port,
                 "files": files
             }
-            response = await client.post(f"{discovery_url}/register", json=payload)
+            response = await client.post(
+                f"{discovery_url}/register",
+                content=orjson.dumps(payload),
+                headers={"Content-Type": "application/json"}
+            )
             print(f"Registered with discovery service: {response.json()}")
             return True
     except Exception as e:
@@ -44,16 +50,28 @@ async def register_peer(discovery_url, peer_id, public_key_pem, port, shared_dir
 
 
 async def heartbeat_loop(discovery_url, peer_id, interval=30):
-    """Send periodic heartbeats to keep peer registered."""
-    while True:
-        try:
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                response = await client.get(f"{discovery_url}/heartbeat", params={"peer_id": peer_id})
-                print(f"Heartbeat sent: {response.json()}")
-        except Exception as e:
-            print(f"Heartbeat failed: {e}")
-        
-        await asyncio.sleep(interval)
+    """Send heartbeats as single UDP datagrams.
+
+    UDP has no handshake, so each beat is exactly one packet instead of
+    a TCP connect + HTTP request/response round-trip.
+    """
+    host = discovery_url.split("//", 1)[-1].rsplit(":", 1)[0]
+    loop = asyncio.get_running_loop()
+    transport, _ = await loop.create_datagram_endpoint(
+        asyncio.DatagramProtocol,
+        remote_addr=(host, HEARTBEAT_PORT)
+    )
+    try:
+        while True:
+            try:
+                transport.sendto(peer_id.encode())
+                print("Heartbeat sent")
+            except Exception as e:
+                print(f"Heartbeat failed: {e}")
+
+            await asyncio.sleep(interval)
+    finally:
+        transport.close()
 
 
 async def main():
@@ -66,6 +84,10 @@ async def main():
     parser.add_argument("--shared-dir", default="shared", help="Directory for shared files")
     parser.add_argument("--download-file", help="File to download (client mode)")
     parser.add_argument("--output-dir", default="downloads", help="Directory to save downloaded files")
+    parser.add_argument("--server-workers", type=int, default=1,
+                        help="Peer server processes sharing the port via SO_REUSEPORT")
+    parser.add_argument("--fast-lan", action="store_true",
+                        help="Use ChaCha20-Poly1305 for transfers (faster on CPUs without AES-NI)")
     
     args = parser.parse_args()
     
@@ -74,7 +96,8 @@ async def main():
     if args.mode == "discovery":
         # Run only the discovery service
         print(f"Starting discovery service on {args.discovery_host}:{args.discovery_port}")
-        uvicorn.run(discovery_app, host=args.discovery_host, port=args.discovery_port, log_level="info")
+        uvicorn.run(discovery_app, host=args.discovery_host, port=args.discovery_port,
+                    log_level="info", loop="uvloop")
     
     elif args.mode == "peer":
         # Run only the peer server
@@ -85,6 +108,8 @@ async def main():
         print(f"Starting peer server on port {args.peer_port}")
         
         os.makedirs(args.shared_dir, exist_ok=True)
+        if args.server_workers > 1:
+            start_server_processes(args.peer_port, args.shared_dir, args.server_workers)
         await start_server(args.peer_port, args.shared_dir)
     
     elif args.mode == "client":
@@ -94,7 +119,8 @@ async def main():
             sys.exit(1)
         
         print(f"Downloading {args.download_file} from discovery service at {discovery_url}")
-        success = await download_from_discovery(discovery_url, args.download_file, args.output_dir)
+        success = await download_from_discovery(discovery_url, args.download_file, args.output_dir,
+                                                fast_lan=args.fast_lan)
         sys.exit(0 if success else 1)
     
     elif args.mode == "full":
@@ -120,7 +146,7 @@ async def main():
         # Start discovery service in background thread
         def run_discovery():
             uvicorn.run(discovery_app, host=args.discovery_host, port=args.discovery_port,
-                       log_level="error", access_log=False)
+                       log_level="error", access_log=False, loop="uvloop")
         
         discovery_thread = Thread(target=run_discovery, daemon=True)
         discovery_thread.start()
@@ -135,6 +161,8 @@ async def main():
         
         # Start heartbeat and peer server tasks
         os.makedirs(args.shared_dir, exist_ok=True)
+        if args.server_workers > 1:
+            start_server_processes(args.peer_port, args.shared_dir, args.server_workers)
         
         heartbeat_task = asyncio.create_task(heartbeat_loop(discovery_url, peer_id, interval=30))
         server_task = asyncio.create_task(start_server(args.peer_port, args.shared_dir))
@@ -148,4 +176,7 @@ async def main():
 
 
 if __name__ == "__main__":
+    # libuv-backed event loop: faster connection setup and task scheduling
+    # than the pure-Python selector loop, with no code changes
+    uvloop.install()
     asyncio.run(main())
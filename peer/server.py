@@ -1,51 +1,104 @@
 import asyncio
+import logging
 import os
+import struct
 from .identity import get_peer_id, load_keys
-from .crypto import aes_encrypt, generate_aes_key, encrypt_session_key, decrypt_session_key, aes_decrypt
-from .protocol import HELLO, SESSION
+from .crypto import derive_session_key, Session, SERVER_NONCE_TAG
+from .protocol import (HELLO, SESSION, SOCKET_BUF_SIZE, tune_socket,
+                       OP_META, OP_GET, OP_DONE, OP_CHUNK, OP_ERROR)
 from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import x25519
 from .chunk_manager import get_file_metadata, read_chunk
 
 """
 Server-side logic for handling peer connections and encrypted file transfers.
 Protocol: HELLO -> SESSION -> META/GET/CHUNK/DONE messages (AES-encrypted)
 """
+
+# Per-chunk messages go through debug-level logging with lazy %-style
+# formatting, so a transfer at the default level costs no stdio writes
+# or string building on the event loop
+log = logging.getLogger("peer")
+
 async def handle_peer(reader, writer, shared_dir="shared"):
-    # Receive HELLO message with peer_id and public_key
-    data = await reader.read(1024)
+    tune_socket(writer.get_extra_info("socket"))
+    # Let several chunk responses queue in the transport before drain()
+    # blocks, so the socket never sits idle between responses
+    writer.transport.set_write_buffer_limits(high=SOCKET_BUF_SIZE)
+    
+    # Receive the fixed-length HELLO record: tag + flags (1 byte) +
+    # peer_id (32 bytes) + raw X25519 public key (32 bytes)
+    try:
+        data = await reader.readexactly(len(HELLO) + 1 + 32 + 32)
+    except asyncio.IncompleteReadError:
+        writer.close()
+        return
     if not data.startswith(HELLO):
-        print("Invalid protocol message")
+        log.warning("Invalid protocol message")
         writer.close()
         return
     
+    fast_lan = bool(data[len(HELLO)] & 1)
+    peer_id = data[len(HELLO) + 1:len(HELLO) + 33].hex()
+    peer_public_key = x25519.X25519PublicKey.from_public_bytes(data[-32:])
     
-    _, peer_id, public_key_pem = data.split(b"|", 2)
-    
-    # Load the public key from PEM bytes
-    peer_public_key = serialization.load_pem_public_key(public_key_pem)
-    
-    # Generate AES session key and encrypt it with the peer's public key
-    aes_key = generate_aes_key()
-    encrypted_key = encrypt_session_key(peer_public_key, aes_key)
+    # Derive the session key from an ephemeral X25519 exchange
+    ephemeral_key = x25519.X25519PrivateKey.generate()
+    key_length = 32 if fast_lan else 16
+    aes_key = derive_session_key(ephemeral_key, peer_public_key, length=key_length)
+    ephemeral_public_raw = ephemeral_key.public_key().public_bytes(
+        encoding=serialization.Encoding.Raw,
+        format=serialization.PublicFormat.Raw
+    )
     
-    # Send SESSION message with the encrypted AES key
-    writer.write(SESSION + b"|" + encrypted_key)
+    # Send SESSION message with the raw ephemeral public key
+    writer.write(SESSION + ephemeral_public_raw)
     await writer.drain()
     
-    print("Handshake completed with peer. Session now established.")
-    await serve_file(reader, writer, aes_key, shared_dir)
+    log.debug("Handshake completed with peer. Session now established.")
+    cipher = "chacha20" if fast_lan else "aes-gcm"
+    session = Session(aes_key, SERVER_NONCE_TAG, cipher=cipher)
+    await serve_file(reader, writer, session, shared_dir)
     
 async def start_server(port=9000, shared_dir="shared"):
+    logging.basicConfig(level=os.environ.get("FS_LOG", "INFO"))
+    
     async def handler(reader, writer):
         await handle_peer(reader, writer, shared_dir)
     
-    server = await asyncio.start_server(handler, "0.0.0.0", port)
-    print(f"Server listening on port {port}")
+    # reuse_port lets additional worker processes bind the same port and
+    # have the kernel spread incoming connections across them
+    server = await asyncio.start_server(handler, "0.0.0.0", port, reuse_port=True)
+    log.info("Server listening on port %d", port)
     async with server:
         await server.serve_forever()
         
         
-async def serve_file(reader, writer, aes_key, shared_dir="shared"):
+def _worker_main(port, shared_dir):
+    asyncio.run(start_server(port, shared_dir))
+
+
+def start_server_processes(port=9000, shared_dir="shared", workers=None):
+    """Fork extra server processes listening on the same port.
+
+    Serving files is CPU-bound (AES + hashing) and one process saturates
+    one core; with SO_REUSEPORT each worker gets its own GIL and the
+    kernel load-balances connections, so throughput scales with cores.
+    The shared directory is read-only to the servers, so the processes
+    need no coordination.
+    """
+    import multiprocessing
+    if workers is None:
+        workers = os.cpu_count() or 1
+    processes = []
+    for _ in range(workers - 1):
+        p = multiprocessing.Process(target=_worker_main, args=(port, shared_dir), daemon=True)
+        p.start()
+        processes.append(p)
+    return processes
+
+
+async def serve_file(reader, writer, session, shared_dir="shared"):
     """Handle file transfer requests from peer."""
     try:
         while True:
@@ -62,51 +115,59 @@ async def serve_file(reader, writer, aes_key, shared_dir="shared"):
             if not encrypted_message:
                 break
                 
-            request = aes_decrypt(aes_key, encrypted_message).decode()
-            print(f"Received request: {request}")
+            request = session.decrypt(encrypted_message)
+            op = request[0]
             
-            if request.startswith("META"):
-                _, filename = request.split("|", 1)
+            if op == OP_META:
+                filename = request[1:].decode()
                 file_path = os.path.join(shared_dir, filename)
                 
                 if not os.path.exists(file_path):
-                    error_msg = f"ERROR|File not found: {filename}"
-                    encrypted_response = aes_encrypt(aes_key, error_msg.encode())
+                    error_msg = bytes([OP_ERROR]) + f"File not found: {filename}".encode()
+                    encrypted_response = session.encrypt(error_msg)
                     writer.write(len(encrypted_response).to_bytes(4, 'big') + encrypted_response)
                     await writer.drain()
                     continue
                     
                 meta = get_file_metadata(file_path)
-                meta_msg = f"META|{meta['filename']}|{meta['size']}|{meta['chunksize']}|{meta['chunks']}|{meta['hash']}"
-                encrypted_response = aes_encrypt(aes_key, meta_msg.encode())
+                chunk_hashes = ",".join(meta['chunk_hashes'])
+                meta_msg = f"{meta['filename']}|{meta['size']}|{meta['chunksize']}|{meta['chunks']}|{meta['hash']}|{chunk_hashes}"
+                if meta['chunks'] == 1:
+                    # Single-chunk files ride along with the metadata, saving
+                    # the client a GET round-trip
+                    encrypted_response = session.encrypt_parts(
+                        bytes([OP_META]) + meta_msg.encode() + b"|", read_chunk(file_path, 0))
+                else:
+                    encrypted_response = session.encrypt(bytes([OP_META]) + meta_msg.encode())
                 writer.write(len(encrypted_response).to_bytes(4, 'big') + encrypted_response)
                 await writer.drain()
-                print(f"Sent metadata for {filename}")
+                log.debug("Sent metadata for %s", filename)
                 
-            elif request.startswith("GET"):
-                _, filename, chunk_index = request.split("|")
-                chunk_index = int(chunk_index)
+            elif op == OP_GET:
+                # Fixed-offset header: opcode (1 byte) + chunk index (4 bytes),
+                # filename as the remaining bytes
+                chunk_index = struct.unpack_from("!I", request, 1)[0]
+                filename = request[5:].decode()
                 file_path = os.path.join(shared_dir, filename)
                 
                 if not os.path.exists(file_path):
-                    error_msg = f"ERROR|File not found: {filename}"
-                    encrypted_response = aes_encrypt(aes_key, error_msg.encode())
+                    error_msg = bytes([OP_ERROR]) + f"File not found: {filename}".encode()
+                    encrypted_response = session.encrypt(error_msg)
                     writer.write(len(encrypted_response).to_bytes(4, 'big') + encrypted_response)
                     await writer.drain()
                     continue
                     
                 data = read_chunk(file_path, chunk_index)
-                payload = f"CHUNK|{chunk_index}|".encode() + data
-                encrypted_response = aes_encrypt(aes_key, payload)
-                writer.write(len(encrypted_response).to_bytes(4, 'big') + encrypted_response)
+                encrypted_response = session.encrypt_parts(struct.pack("!BI", OP_CHUNK, chunk_index), data)
+                writer.writelines([len(encrypted_response).to_bytes(4, 'big'), encrypted_response])
                 await writer.drain()
-                print(f"Sent chunk {chunk_index} of {filename}")
+                log.debug("Sent chunk %d of %s", chunk_index, filename)
                 
-            elif request == "DONE":
-                print("Peer finished downloading file.")
+            elif op == OP_DONE:
+                log.debug("Peer finished downloading file.")
                 writer.close()
                 break
                 
     except Exception as e:
-        print(f"Error in serve_file: {e}")
+        log.error("Error in serve_file: %s", e)
         writer.close()
\ No newline at end of file
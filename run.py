@@ -10,6 +10,7 @@ All in one command!
 """
 
 import subprocess
+import socket
 import time
 import sys
 import os
@@ -26,18 +27,56 @@ def print_banner():
     print(banner)
 
 
-def print_instruction(title, instruction):
-    """Pretty print an instruction."""
-    print(f"  📝 {title}")
-    print(f"     {instruction}")
-    print()
+def format_instruction(title, instruction):
+    """Format an instruction block."""
+    return f"  📝 {title}\n     {instruction}\n\n"
+
+
+def fast_loop_flags():
+    """uvicorn flags pinning the uvloop event loop and httptools parser.
+
+    With the default `--loop auto --http auto`, uvicorn silently falls
+    back to the pure-Python asyncio loop and h11 parser when the
+    speedups are missing; pinning them keeps every service on the fast
+    path, with a visible warning instead of a silent fallback.
+    """
+    try:
+        import uvloop, httptools  # noqa: F401
+    except ImportError:
+        print("  [!] uvloop/httptools not installed - using default event loop")
+        return []
+    return ["--loop", "uvloop", "--http", "httptools"]
+
+
+def wait_port(port, timeout=5.0):
+    """Poll until a local TCP port accepts connections.
+
+    Replaces the fixed sleeps between service launches: startup moves
+    on the moment a service actually binds its socket instead of
+    waiting a heuristic second or two.
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.1):
+                return True
+        except OSError:
+            time.sleep(0.05)
+    return False
+
+
+# Children started by start_service, so Ctrl+C can shut them all down
+# instead of leaking them
+services = []
 
 
 def start_service(name, command, port):
     """Start a service and monitor it."""
     print(f"  [✓] Starting {name} on port {port}...")
     try:
-        subprocess.Popen(command, shell=True, cwd=os.getcwd())
+        # argv exec: no /bin/sh fork between us and the service, so
+        # startup is quicker and the Popen handle is the real process
+        services.append(subprocess.Popen(command, cwd=os.getcwd()))
     except Exception as e:
         print(f"  [✗] Failed to start {name}: {e}")
         return False
@@ -52,72 +91,88 @@ def main():
     print("=" * 62)
     print()
 
+    loop_flags = fast_loop_flags()
+
+    # Both uvicorn services stay single-worker on purpose: discovery
+    # keeps the peer registry (PEERS/FILE_INDEX) and the UI keeps
+    # ui_state in process memory, and --workers would shard that state
+    # across processes. The CPU-bound peer server is the one that
+    # scales out — via --server-workers and SO_REUSEPORT.
+
     # Start discovery service
     print("1️⃣  DISCOVERY SERVICE")
     start_service(
         "Discovery Service",
-        'python -m uvicorn peer.main:app --host 0.0.0.0 --port 8000 --log-level error',
+        [sys.executable, "-m", "uvicorn", "peer.main:app",
+         "--host", "0.0.0.0", "--port", "8000", "--log-level", "error"] + loop_flags,
         8000
     )
-    time.sleep(1)
+    if not wait_port(8000):
+        print(f"  [!] Port 8000 not responding yet - continuing anyway")
     print()
 
     # Start peer server
     print("2️⃣  PEER SERVER")
     start_service(
         "Peer Server",
-        'python peer/runner.py --mode peer --peer-port 9000 --shared-dir shared',
+        [sys.executable, "peer/runner.py", "--mode", "peer",
+         "--peer-port", "9000", "--shared-dir", "shared"],
         9000
     )
-    time.sleep(1)
+    if not wait_port(9000):
+        print(f"  [!] Port 9000 not responding yet - continuing anyway")
     print()
 
     # Start web UI
     print("3️⃣  WEB UI DASHBOARD")
     start_service(
         "Web UI",
-        'python -m uvicorn ui.api:app --host 0.0.0.0 --port 8080 --log-level error',
+        [sys.executable, "-m", "uvicorn", "ui.api:app",
+         "--host", "0.0.0.0", "--port", "8080", "--log-level", "error"] + loop_flags,
         8080
     )
-    time.sleep(2)
-    print()
-
-    # Print success message
-    print("=" * 62)
-    print("✓ ALL SERVICES STARTED!")
-    print("=" * 62)
+    if not wait_port(8080):
+        print(f"  [!] Port 8080 not responding yet - continuing anyway")
     print()
 
-    print("📊 DASHBOARD ACCESS")
-    print_instruction("Web UI", "→ http://localhost:8080")
-    print_instruction("Discovery API", "→ http://localhost:8000")
-    print_instruction("Peer Server", "→ 127.0.0.1:9000")
-
-    print("📁 DIRECTORIES")
-    print_instruction("Shared Files", "→ ./shared/")
-    print_instruction("Downloaded Files", "→ ./downloads/")
-    print_instruction("Keys", "→ ./keys/")
-
-    print("🎯 NEXT STEPS")
-    print_instruction("1. Open browser", "http://localhost:8080")
-    print_instruction("2. Upload files", "Use the 'Share Files' section")
-    print_instruction("3. Browse peers", "View 'Online Peers'")
-    print_instruction("4. Download files", "Search and download from peers")
-
-    print("🔐 FEATURES")
-    print_instruction("RSA-2048 + AES-256", "Bank-grade encryption")
-    print_instruction("Concurrent Downloads", "4 chunks in parallel")
-    print_instruction("Auto-Discovery", "Peers auto-register")
-    print_instruction("File Verification", "SHA-256 integrity checks")
-
-    print("🛑 TO STOP")
-    print_instruction("Press Ctrl+C", "Closes all services")
-    print()
-
-    print("=" * 62)
-    print("SERVICES RUNNING - DASHBOARD READY AT http://localhost:8080")
-    print("=" * 62)
-    print()
+    # Print success message. The whole post-startup banner goes out as
+    # one write instead of ~40 print() syscalls on a line-buffered TTY.
+    out = []
+    out.append("=" * 62 + "\n")
+    out.append("✓ ALL SERVICES STARTED!\n")
+    out.append("=" * 62 + "\n\n")
+
+    out.append("📊 DASHBOARD ACCESS\n")
+    out.append(format_instruction("Web UI", "→ http://localhost:8080"))
+    out.append(format_instruction("Discovery API", "→ http://localhost:8000"))
+    out.append(format_instruction("Peer Server", "→ 127.0.0.1:9000"))
+
+    out.append("📁 DIRECTORIES\n")
+    out.append(format_instruction("Shared Files", "→ ./shared/"))
+    out.append(format_instruction("Downloaded Files", "→ ./downloads/"))
+    out.append(format_instruction("Keys", "→ ./keys/"))
+
+    out.append("🎯 NEXT STEPS\n")
+    out.append(format_instruction("1. Open browser", "http://localhost:8080"))
+    out.append(format_instruction("2. Upload files", "Use the 'Share Files' section"))
+    out.append(format_instruction("3. Browse peers", "View 'Online Peers'"))
+    out.append(format_instruction("4. Download files", "Search and download from peers"))
+
+    out.append("🔐 FEATURES\n")
+    out.append(format_instruction("RSA-2048 + AES-256", "Bank-grade encryption"))
+    out.append(format_instruction("Concurrent Downloads", "4 chunks in parallel"))
+    out.append(format_instruction("Auto-Discovery", "Peers auto-register"))
+    out.append(format_instruction("File Verification", "SHA-256 integrity checks"))
+
+    out.append("🛑 TO STOP\n")
+    out.append(format_instruction("Press Ctrl+C", "Closes all services"))
+    out.append("\n")
+
+    out.append("=" * 62 + "\n")
+    out.append("SERVICES RUNNING - DASHBOARD READY AT http://localhost:8080\n")
+    out.append("=" * 62 + "\n\n")
+    sys.stdout.write("".join(out))
+    sys.stdout.flush()
 
     # Keep the script running
     try:
@@ -125,6 +180,15 @@ def main():
             time.sleep(1)
     except KeyboardInterrupt:
         print("\n\n🛑 Shutting down services...")
+        # The old handler exited without touching the children, leaving
+        # three orphan servers holding the ports
+        for proc in services:
+            proc.terminate()
+        for proc in services:
+            try:
+                proc.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                proc.kill()
         sys.exit(0)
 
 
@@ -9,10 +9,12 @@ SHARED_DIR = "shared"
 DOWNLOADS_DIR = "downloads"
 DISCOVERY_URL = "http://localhost:8000"
 
+# Canonical absolute forms, resolved once at import; the trailing
+# separator makes prefix checks safe against sibling names such as
+# "shared_evil"
+SHARED_DIR_ABS = os.path.realpath(SHARED_DIR) + os.sep
+DOWNLOADS_DIR_ABS = os.path.realpath(DOWNLOADS_DIR) + os.sep
+
 # Server
 UI_HOST = "0.0.0.0"
 UI_PORT = 8080
-
-# Ensure directories exist
-os.makedirs(SHARED_DIR, exist_ok=True)
-os.makedirs(DOWNLOADS_DIR, exist_ok=True)
@@ -1,5 +1,25 @@
 const API_BASE = '/api';
 
+// fetch with a deadline: a wedged backend aborts the request after
+// timeoutMs instead of holding a poll slot (and its UI state) forever.
+// A caller-supplied signal still works; either source aborts the fetch.
+async function jfetch(url, opts = {}, timeoutMs = 4000) {
+    const controller = new AbortController();
+    const timer = setTimeout(() => controller.abort(), timeoutMs);
+    if (opts.signal) {
+        opts.signal.addEventListener('abort', () => controller.abort(), { once: true });
+    }
+    try {
+        return await fetch(url, { ...opts, signal: controller.signal });
+    } finally {
+        clearTimeout(timer);
+    }
+}
+
+// Last ETag seen from /api/status; sent back so unchanged polls return
+// an empty 304 and skip all DOM work
+let statusEtag = null;
+
 // =====================================================================
 // INITIALIZATION
 // =====================================================================
@@ -13,27 +33,73 @@ document.addEventListener('DOMContentLoaded', async () => {
 
     setupUploadArea();
     setupSearch();
+    setupAnimationPausing();
+    setupDownloadEvents();
+    setupListDelegation();
+    setupRefreshButtons();
 
     // Refresh data periodically
-    setInterval(refreshPeers, 10000);  // Every 10 seconds
-    setInterval(refreshSharedFiles, 5000);  // Every 5 seconds
-    setInterval(refreshConnectedPeers, 10000);  // Every 10 seconds
+    scheduler.start();
 });
 
 // =====================================================================
 // STATUS & INITIALIZATION
 // =====================================================================
 
+// One timer drives all periodic refreshes. Jobs skip their turn while
+// the tab is hidden (nothing visible to update) or while their previous
+// run is still in flight, so slow responses never stack requests.
+const scheduler = {
+    jobs: [
+        { fn: () => refreshPeers(), period: 10000, last: 0, running: false },
+        { fn: () => refreshSharedFiles(), period: 5000, last: 0, running: false },
+        { fn: () => refreshConnectedPeers(), period: 10000, last: 0, running: false }
+    ],
+
+    start() {
+        setInterval(() => this.tick(), 1000);
+    },
+
+    tick() {
+        if (document.hidden) return;
+        const now = performance.now();
+        for (const job of this.jobs) {
+            if (!job.running && now - job.last >= job.period) {
+                job.last = now;
+                job.running = true;
+                Promise.resolve(job.fn()).finally(() => { job.running = false; });
+            }
+        }
+    }
+};
+
+// The pulse/spin keyframes run forever and wake the compositor every
+// frame; pause them whenever nobody can see them.
+function setupAnimationPausing() {
+    const observer = new IntersectionObserver(entries => {
+        for (const entry of entries) {
+            entry.target.classList.toggle('anim-paused', !entry.isIntersecting);
+        }
+    });
+    document.querySelectorAll('.status-dot, .loading, .spinner').forEach(el => {
+        observer.observe(el);
+    });
+
+    document.addEventListener('visibilitychange', () => {
+        document.body.classList.toggle('tab-hidden', document.hidden);
+    });
+}
+
 async function loadStatus() {
     try {
-        const response = await fetch(`${API_BASE}/status`);
+        const response = await jfetch(`${API_BASE}/status`);
         const data = await response.json();
 
         document.getElementById('peer-id').textContent = data.peer_id;
 
         // Try to register with discovery
         try {
-            await fetch(`${API_BASE}/register`, {
+            await jfetch(`${API_BASE}/register`, {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
                 body: JSON.stringify({ port: data.port })
@@ -88,25 +154,29 @@ function setupUploadArea() {
 
 async function handleFileSelect() {
     const fileInput = document.getElementById('fileInput');
-    const files = fileInput.files;
+    const queue = Array.from(fileInput.files);
 
-    for (let file of files) {
-        await uploadFile(file);
-    }
+    // Up to four uploads in flight instead of strictly one at a time
+    const workers = Array.from({ length: Math.min(4, queue.length) }, async () => {
+        while (queue.length > 0) {
+            await uploadFile(queue.shift());
+        }
+    });
+    await Promise.all(workers);
 
     fileInput.value = '';
     await refreshSharedFiles();
 }
 
 async function uploadFile(file) {
-    const formData = new FormData();
-    formData.append('file', file);
-
     try {
-        const response = await fetch(`${API_BASE}/upload`, {
+        // Send the File directly as the body: the browser streams it
+        // from disk with no FormData copy or multipart framing
+        const response = await jfetch(`${API_BASE}/upload?filename=${encodeURIComponent(file.name)}`, {
             method: 'POST',
-            body: formData
-        });
+            body: file,
+            headers: { 'Content-Type': 'application/octet-stream' }
+        }, 10 * 60 * 1000);
 
         if (response.ok) {
             const data = await response.json();
@@ -123,7 +193,7 @@ async function deleteSharedFile(filename) {
     if (!confirm(`Delete "${filename}" from shared files?`)) return;
 
     try {
-        const response = await fetch(`${API_BASE}/shared/${filename}`, {
+        const response = await jfetch(`${API_BASE}/shared/${filename}`, {
             method: 'DELETE'
         });
 
@@ -140,7 +210,7 @@ async function deleteDownloadedFile(filename) {
     if (!confirm(`Delete "${filename}"?`)) return;
 
     try {
-        const response = await fetch(`${API_BASE}/download/${filename}`, {
+        const response = await jfetch(`${API_BASE}/download/${filename}`, {
             method: 'DELETE'
         });
 
@@ -153,96 +223,216 @@ async function deleteDownloadedFile(filename) {
     }
 }
 
+// =====================================================================
+// LIST RENDERING
+// =====================================================================
+
+// Reconcile a container's children with a data list by key instead of
+// rebuilding innerHTML: on a poll tick where nothing changed (the common
+// case) no nodes are parsed, torn down or relaid out.
+function syncList(container, items, keyFn, createNode, updateNode, emptyHtml) {
+    if (items.length === 0) {
+        if (container.dataset.empty !== '1') {
+            container.innerHTML = emptyHtml;
+            container.dataset.empty = '1';
+        }
+        return;
+    }
+    if (container.dataset.empty === '1') {
+        container.innerHTML = '';
+        delete container.dataset.empty;
+    }
+
+    const existing = new Map();
+    for (const node of container.children) {
+        existing.set(node.dataset.key, node);
+    }
+
+    let previous = null;
+    for (const item of items) {
+        const key = keyFn(item);
+        let node = existing.get(key);
+        if (node) {
+            existing.delete(key);
+            updateNode(node, item);
+        } else {
+            node = createNode(item);
+            node.dataset.key = key;
+        }
+        // Only move nodes that are out of order relative to the data
+        const ref = previous ? previous.nextSibling : container.firstChild;
+        if (node !== ref) {
+            container.insertBefore(node, ref);
+        }
+        previous = node;
+    }
+
+    for (const node of existing.values()) {
+        node.remove();
+    }
+}
+
+// The refresh icon spins once per click; tying the rotation to hover
+// made it animate on every cursor pass
+function setupRefreshButtons() {
+    document.querySelectorAll('.refresh-btn').forEach(button => {
+        button.addEventListener('click', () => button.classList.add('spinning'));
+        button.addEventListener('animationend', () => button.classList.remove('spinning'));
+    });
+}
+
+// One bubbling listener per list container instead of a handler bound
+// to every rendered button
+function setupListDelegation() {
+    document.getElementById('sharedFiles').addEventListener('click', (e) => {
+        const button = e.target.closest('.btn-danger');
+        if (button) {
+            deleteSharedFile(button.closest('.file-item').dataset.key);
+        }
+    });
+    document.getElementById('downloadedFiles').addEventListener('click', (e) => {
+        const button = e.target.closest('.btn-danger');
+        if (button) {
+            deleteDownloadedFile(button.closest('.file-item').dataset.key);
+        }
+    });
+    document.getElementById('searchResults').addEventListener('click', (e) => {
+        const button = e.target.closest('[data-action="download"]');
+        if (button) {
+            downloadFromPeer(button.dataset.filename, button.dataset.peerId,
+                             button.dataset.ip, parseInt(button.dataset.port));
+        }
+    });
+}
+
+function createFileItem(file, icon) {
+    const tpl = document.getElementById('tpl-file-item');
+    const item = tpl.content.firstElementChild.cloneNode(true);
+    item.querySelector('.file-name').textContent = `${icon} ${file.name}`;
+    item.querySelector('.file-size').textContent = `${file.size_mb} MB`;
+    return item;
+}
+
+function updateFileItem(node, file) {
+    node.querySelector('.file-size').textContent = `${file.size_mb} MB`;
+}
+
 async function refreshSharedFiles() {
     try {
-        const response = await fetch(`${API_BASE}/status`);
+        const headers = statusEtag ? { 'If-None-Match': statusEtag } : {};
+        const response = await jfetch(`${API_BASE}/status`, { headers });
+        if (response.status === 304) {
+            return;
+        }
+        statusEtag = response.headers.get('ETag');
         const data = await response.json();
 
-        const container = document.getElementById('sharedFiles');
-
-        if (data.shared_files.length === 0) {
-            container.innerHTML = `
+        syncList(
+            document.getElementById('sharedFiles'),
+            data.shared_files,
+            file => file.name,
+            file => createFileItem(file, '📄'),
+            updateFileItem,
+            `
                 <div class="empty-state">
                     <div class="empty-icon">📁</div>
                     <p>No files shared yet</p>
                 </div>
-            `;
-            return;
-        }
-
-        container.innerHTML = data.shared_files.map(file => `
-            <div class="file-item">
-                <div class="file-info">
-                    <div class="file-name">📄 ${escapeHtml(file.name)}</div>
-                    <div class="file-size">${file.size_mb} MB</div>
-                </div>
-                <button class="btn btn-danger" onclick="deleteSharedFile('${escapeHtml(file.name)}')">Delete</button>
-            </div>
-        `).join('');
+            `
+        );
     } catch (error) {
         console.error('Error refreshing shared files:', error);
     }
 }
 
+let downloadsRefreshing = false;
+
 async function refreshDownloadedFiles() {
+    // SSE completion bursts can trigger several refreshes back to back;
+    // the polled endpoints get the same guard from the scheduler
+    if (downloadsRefreshing) return;
+    downloadsRefreshing = true;
     try {
-        const response = await fetch(`${API_BASE}/downloads`);
+        const response = await jfetch(`${API_BASE}/downloads`);
         const data = await response.json();
 
-        const container = document.getElementById('downloadedFiles');
-
-        if (data.downloads.length === 0) {
-            container.innerHTML = `
+        syncList(
+            document.getElementById('downloadedFiles'),
+            data.downloads,
+            file => file.name,
+            file => createFileItem(file, '✓'),
+            updateFileItem,
+            `
                 <div class="empty-state">
                     <div class="empty-icon">📥</div>
                     <p>No files downloaded yet</p>
                 </div>
-            `;
-            return;
-        }
-
-        container.innerHTML = data.downloads.map(file => `
-            <div class="file-item">
-                <div class="file-info">
-                    <div class="file-name">✓ ${escapeHtml(file.name)}</div>
-                    <div class="file-size">${file.size_mb} MB</div>
-                </div>
-                <button class="btn btn-danger" onclick="deleteDownloadedFile('${escapeHtml(file.name)}')">Delete</button>
-            </div>
-        `).join('');
+            `
+        );
     } catch (error) {
         console.error('Error refreshing downloads:', error);
+    } finally {
+        downloadsRefreshing = false;
     }
 }
 
+// Downloads started from this page; completion events for them come in
+// over the server-sent event stream instead of per-file polling loops
+const activeDownloads = new Set();
+
+function setupDownloadEvents() {
+    const source = new EventSource(`${API_BASE}/download-events`);
+    source.onmessage = async (event) => {
+        const progress = JSON.parse(event.data);
+        for (const [filename, state] of Object.entries(progress)) {
+            if (!activeDownloads.has(filename)) continue;
+            if (state.status === 'completed') {
+                activeDownloads.delete(filename);
+                showNotification(`✓ Download complete: ${filename}`, 'success');
+                await refreshDownloadedFiles();
+            } else if (state.status === 'failed') {
+                activeDownloads.delete(filename);
+                showNotification(`✗ Download failed: ${state.error || 'Unknown error'}`, 'error');
+            }
+        }
+    };
+}
+
 // =====================================================================
 // PEERS & SEARCH
 // =====================================================================
 
+function createPeerCard(peer) {
+    const tpl = document.getElementById('tpl-peer-card');
+    const card = tpl.content.firstElementChild.cloneNode(true);
+    card.querySelector('.peer-title').textContent = `🔗 ${peer.peer_id}`;
+    updatePeerCard(card, peer);
+    return card;
+}
+
+function updatePeerCard(node, peer) {
+    node.querySelector('.peer-detail').textContent = `${peer.ip}:${peer.port}`;
+    node.querySelector('.peer-files').textContent = `${peer.files} file(s)`;
+}
+
 async function refreshPeers() {
     try {
-        const response = await fetch(`${API_BASE}/peers`);
+        const response = await jfetch(`${API_BASE}/peers`);
         const data = await response.json();
 
-        const container = document.getElementById('peersList');
-
-        if (data.peers.length === 0) {
-            container.innerHTML = `
+        syncList(
+            document.getElementById('peersList'),
+            data.peers,
+            peer => peer.peer_id,
+            createPeerCard,
+            updatePeerCard,
+            `
                 <div class="empty-state" style="grid-column: 1/-1;">
                     <div class="empty-icon">👥</div>
                     <p>No peers online</p>
                 </div>
-            `;
-            return;
-        }
-
-        container.innerHTML = data.peers.map(peer => `
-            <div class="peer-card">
-                <div class="peer-title">🔗 ${escapeHtml(peer.peer_id)}</div>
-                <div class="peer-detail">${escapeHtml(peer.ip)}:${peer.port}</div>
-                <div class="peer-files">${peer.files} file(s)</div>
-            </div>
-        `).join('');
+            `
+        );
     } catch (error) {
         console.error('Error refreshing peers:', error);
     }
@@ -255,22 +445,66 @@ function setupSearch() {
             searchFiles();
         }
     });
+
+    // Trailing debounce so typing triggers one search per pause, not
+    // one per keystroke
+    let debounceTimer;
+    searchInput.addEventListener('input', () => {
+        clearTimeout(debounceTimer);
+        debounceTimer = setTimeout(searchFiles, 250);
+    });
 }
 
+// Results for recent queries: repeated searches render instantly with
+// no request. Insertion-ordered Map gives cheap LRU eviction.
+const searchCache = new Map();
+const SEARCH_CACHE_MAX = 32;
+let searchAbort = null;
+
 async function searchFiles() {
     const filename = document.getElementById('searchInput').value.trim();
     if (!filename) {
-        showNotification('Please enter a filename', 'info');
         return;
     }
 
+    const cached = searchCache.get(filename);
+    if (cached) {
+        // Refresh its LRU position before rendering
+        searchCache.delete(filename);
+        searchCache.set(filename, cached);
+        renderSearchResults(filename, cached);
+        return;
+    }
+
+    // A newer query supersedes any in-flight request
+    if (searchAbort) {
+        searchAbort.abort();
+    }
+    searchAbort = new AbortController();
+
     try {
-        const response = await fetch(`${API_BASE}/peers/search?filename=${encodeURIComponent(filename)}`);
+        const response = await jfetch(
+            `${API_BASE}/peers/search?filename=${encodeURIComponent(filename)}`,
+            { signal: searchAbort.signal }
+        );
         const data = await response.json();
 
-        const container = document.getElementById('searchResults');
+        searchCache.set(filename, data);
+        if (searchCache.size > SEARCH_CACHE_MAX) {
+            searchCache.delete(searchCache.keys().next().value);
+        }
+        renderSearchResults(filename, data);
+    } catch (error) {
+        if (error.name !== 'AbortError') {
+            showNotification(`Error searching: ${error.message}`, 'error');
+        }
+    }
+}
+
+function renderSearchResults(filename, data) {
+    const container = document.getElementById('searchResults');
 
-        if (data.error || data.found === 0) {
+    if (data.error || data.found === 0) {
             container.innerHTML = `
                 <div class="empty-state" style="margin-top: 20px;">
                     <div class="empty-icon">🔍</div>
@@ -292,7 +526,7 @@ async function searchFiles() {
                                 <div style="font-weight: 600; color: #333;">${escapeHtml(peer.peer_id)}</div>
                                 <div style="font-size: 0.85em; color: #666; font-family: monospace; margin-top: 4px;">${escapeHtml(peer.ip)}:${peer.port}</div>
                             </div>
-                            <button class="btn btn-primary" onclick="downloadFromPeer('${escapeHtml(filename)}', '${escapeHtml(peer.peer_id_full)}', '${escapeHtml(peer.ip)}', ${peer.port})">
+                            <button class="btn btn-primary" data-action="download" data-filename="${escapeHtml(filename)}" data-peer-id="${escapeHtml(peer.peer_id_full)}" data-ip="${escapeHtml(peer.ip)}" data-port="${peer.port}">
                                 Download
                             </button>
                         </div>
@@ -300,14 +534,11 @@ async function searchFiles() {
                 </div>
             </div>
         `;
-    } catch (error) {
-        showNotification(`Error searching: ${error.message}`, 'error');
-    }
 }
 
 async function downloadFromPeer(filename, peerId, ip, port) {
     try {
-        const response = await fetch(`${API_BASE}/download`, {
+        const response = await jfetch(`${API_BASE}/download`, {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
             body: JSON.stringify({
@@ -320,23 +551,7 @@ async function downloadFromPeer(filename, peerId, ip, port) {
 
         if (response.ok) {
             showNotification(`⏳ Downloading ${filename}...`, 'info');
-
-            // Poll progress
-            const checkProgress = async () => {
-                const progressResponse = await fetch(`${API_BASE}/download-progress/${encodeURIComponent(filename)}`);
-                const progress = await progressResponse.json();
-
-                if (progress.status === 'completed') {
-                    showNotification(`✓ Download complete: ${filename}`, 'success');
-                    await refreshDownloadedFiles();
-                } else if (progress.status === 'failed') {
-                    showNotification(`✗ Download failed: ${progress.error || 'Unknown error'}`, 'error');
-                } else {
-                    setTimeout(checkProgress, 500);
-                }
-            };
-
-            setTimeout(checkProgress, 500);
+            activeDownloads.add(filename);
         }
     } catch (error) {
         showNotification(`Error starting download: ${error.message}`, 'error');
@@ -360,10 +575,18 @@ function showNotification(message, type = 'info') {
     }, 3000);
 }
 
+const ESCAPE_MAP = {
+    '&': '&amp;',
+    '<': '&lt;',
+    '>': '&gt;',
+    '"': '&quot;',
+    "'": '&#39;'
+};
+
 function escapeHtml(text) {
-    const div = document.createElement('div');
-    div.textContent = text;
-    return div.innerHTML;
+    // Pure string replace: the old temp-<div> version allocated a DOM
+    // node and ran the parser and serializer on every call
+    return String(text).replace(/[&<>"']/g, c => ESCAPE_MAP[c]);
 }
 
 // =====================================================================
@@ -395,7 +618,7 @@ async function updateQRMode() {
     document.getElementById('modeDescription').textContent = description;
     
     try {
-        const response = await fetch(`${API_BASE}/qr/generate?full_mode=${full_mode}`);
+        const response = await jfetch(`${API_BASE}/qr/generate?full_mode=${full_mode}`);
         if (!response.ok) throw new Error('Failed to generate QR');
         
         const data = await response.json();
@@ -658,10 +881,10 @@ async function handleQRFileSelect(event) {
         
         document.getElementById('uploadQRArea').innerHTML = '<div class="spinner"></div>';
         
-        const response = await fetch(`${API_BASE}/qr/decode`, {
+        const response = await jfetch(`${API_BASE}/qr/decode`, {
             method: 'POST',
             body: formData
-        });
+        }, 30000);
         
         if (!response.ok) {
             throw new Error(await response.text());
@@ -708,7 +931,7 @@ async function handleQRFileSelect(event) {
 
 async function connectDirectPeer(peerId, ip, port) {
     try {
-        const response = await fetch(`${API_BASE}/peers/connect`, {
+        const response = await jfetch(`${API_BASE}/peers/connect`, {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
             body: JSON.stringify({
@@ -739,34 +962,39 @@ async function connectDirectPeer(peerId, ip, port) {
     }
 }
 
+function createConnectedPeerCard(peer) {
+    const tpl = document.getElementById('tpl-connected-peer-card');
+    const card = tpl.content.firstElementChild.cloneNode(true);
+    card.querySelector('.peer-title').textContent = peer.peer_id_short;
+    updateConnectedPeerCard(card, peer);
+    return card;
+}
+
+function updateConnectedPeerCard(node, peer) {
+    node.querySelector('.peer-detail').textContent = `${peer.ip}:${peer.port}`;
+}
+
 async function refreshConnectedPeers() {
     try {
-        const response = await fetch(`${API_BASE}/peers/connected`);
+        const response = await jfetch(`${API_BASE}/peers/connected`);
         const data = await response.json();
         
         const container = document.getElementById('connectedPeersList');
         if (!container) return; // Element doesn't exist yet
         
-        if (data.connected_peers.length === 0) {
-            container.innerHTML = `
+        syncList(
+            container,
+            data.connected_peers,
+            peer => peer.peer_id,
+            createConnectedPeerCard,
+            updateConnectedPeerCard,
+            `
                 <div class="empty-state" style="grid-column: 1/-1;">
                     <div class="empty-icon">🔗</div>
                     <p>No connected peers</p>
                 </div>
-            `;
-            return;
-        }
-        
-        container.innerHTML = data.connected_peers.map(peer => `
-            <div class="peer-card" style="border: 2px solid #4CAF50; background: linear-gradient(135deg, rgba(76, 175, 80, 0.1) 0%, rgba(76, 175, 80, 0.05) 100%);">
-                <div style="display: flex; align-items: center; gap: 8px; margin-bottom: 8px;">
-                    <span style="font-size: 1.2em;">🟢</span>
-                    <div class="peer-title" style="margin: 0;">${escapeHtml(peer.peer_id_short)}</div>
-                </div>
-                <div class="peer-detail">${escapeHtml(peer.ip)}:${peer.port}</div>
-                <div style="font-size: 0.8em; color: #4CAF50; margin-top: 8px; font-weight: 600;">✓ Connected</div>
-            </div>
-        `).join('');
+            `
+        );
     } catch (error) {
         console.error('Error refreshing connected peers:', error);
     }
@@ -774,7 +1002,7 @@ async function refreshConnectedPeers() {
 
 async function lookupAndAddPeer(peerId) {
     try {
-        const response = await fetch(`${API_BASE}/peers/lookup?peer_id=${encodeURIComponent(peerId)}`);
+        const response = await jfetch(`${API_BASE}/peers/lookup?peer_id=${encodeURIComponent(peerId)}`);
         
         if (!response.ok) {
             throw new Error('Peer not found in discovery service');
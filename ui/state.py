@@ -2,16 +2,37 @@
 Global UI State Management
 """
 
+from dataclasses import dataclass, field, fields
+
+
+# Slots make every ui_state.x a fixed-offset load instead of a dict
+# lookup hashing the key string — these fields are read on every
+# dashboard poll — and also catch typo'd field names at assignment
+@dataclass(slots=True)
+class UIState:
+    peer_id: str = None
+    public_key: str = None
+    port: int = 9000
+    shared_files: list = field(default_factory=list)
+    total_shared_size: int = 0
+    registered: bool = False
+    download_progress: dict = field(default_factory=dict)
+    online_peers: list = field(default_factory=list)
+    connected_peers: dict = field(default_factory=dict)
+
+
+@dataclass(slots=True)
+class DownloadProgress:
+    """Mutable per-download progress, updated in place rather than
+    replaced with a fresh dict on every state change."""
+    status: str = "unknown"
+    progress: int = 0
+    peer: str = ""
+    error: str = None
+
+
 # Global state for UI
-ui_state = {
-    "peer_id": None,
-    "public_key": None,
-    "port": 9000,
-    "shared_files": [],
-    "registered": False,
-    "download_progress": {},
-    "online_peers": []
-}
+ui_state = UIState()
 
 
 def get_state():
@@ -21,18 +42,11 @@ def get_state():
 
 def update_state(key, value):
     """Update UI state."""
-    ui_state[key] = value
+    setattr(ui_state, key, value)
 
 
 def reset_state():
     """Reset UI state."""
-    global ui_state
-    ui_state = {
-        "peer_id": None,
-        "public_key": None,
-        "port": 9000,
-        "shared_files": [],
-        "registered": False,
-        "download_progress": {},
-        "online_peers": []
-    }
+    for f in fields(UIState):
+        setattr(ui_state, f.name,
+                f.default_factory() if callable(f.default_factory) else f.default)
@@ -5,12 +5,19 @@ This module manages the dashboard HTML by reading separate CSS and JavaScript fi
 The actual template is loaded from dashboard.html in the same directory.
 """
 
+import functools
 import os
 from pathlib import Path
 
 
+@functools.lru_cache(maxsize=1)
 def get_dashboard_html():
-    """Read and return the dashboard HTML with CSS and JavaScript assets."""
+    """Read and return the dashboard HTML with CSS and JavaScript assets.
+
+    Cached after the first call: the template only changes with a
+    restart, so repeat callers get the same string without touching
+    the filesystem.
+    """
     template_dir = Path(__file__).parent
     
     try: